@@ -9,6 +9,15 @@ import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import requests
 import io
+import hashlib
+import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scanner_core import (
+    SHEET_NAME, build_batch_rows, append_sheet_rows, write_local_rows,
+    parse_history_values, MasterFile
+)
 
 # --- CONFIGURATION & SETUP ---
 st.set_page_config(page_title="Scanner Komponen", page_icon="📷", layout="centered")
@@ -22,6 +31,16 @@ if 'user_nik' not in st.session_state:
     st.session_state['user_nik'] = ""
 if 'current_scan' not in st.session_state:
     st.session_state['current_scan'] = None # Stores {'number': '...', 'image_name': '...'}
+if 'cart' not in st.session_state:
+    st.session_state['cart'] = [] # Stores [{'number': '...', 'description': '...', 'qty': 1, 'image_name': '...'}]
+if 'input_nonce' not in st.session_state:
+    st.session_state['input_nonce'] = 0 # Part of the camera/manual widget keys, bumped to clear them
+
+# Helper: Reset Scan
+def reset_scan():
+    # New widget keys drop the old photo / typed code, so the same item is not read again
+    st.session_state['current_scan'] = None
+    st.session_state['input_nonce'] += 1
 
 # Helper: Check Login (DEPRECATED/BYPASSED)
 def check_login(nik, password):
@@ -57,78 +76,54 @@ def get_gspread_client():
 
 # Helper: Save Data
 def save_data(component_number, operator_nik, operator_name, quantity, item_name="", image_name="N/A", session_nik="", reason=""):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Data structure
-    new_row = {
-        "Timestamp": timestamp,
-        "NIK Operator": operator_nik,
-        "Nama Operator": operator_name,
-        "Component Number": component_number,
-        "Nama Barang": item_name,
-        "Quantity": quantity,
-        "Nama Barang": item_name,
-        "Quantity": quantity,
-        "Image Name": image_name,
-        "Keterangan": reason
+    item = {
+        'number': component_number,
+        'description': item_name,
+        'qty': quantity,
+        'image_name': image_name
     }
+    save_data_batch([item], operator_nik, operator_name, session_nik, reason)
+
+# Helper: Save Data (Batch / Keranjang)
+def save_data_batch(items, operator_nik, operator_name, session_nik="", reason=""):
+    """
+    Saves several items picked by one operator as a single transaction.
+    All lines share one timestamp, one Sheets call and one Excel rewrite.
+    Args:
+        items (list): List of dicts with 'number', 'description', 'qty', 'image_name'.
+    """
+    if not items:
+        return
+
+    new_rows, sheet_rows = build_batch_rows(items, operator_nik, operator_name, reason)
     
     # 1. Google Sheets (Global / Centralized)
     client = get_gspread_client()
     if client:
         try:
-            try:
-                sheet = client.open("Data Scan").sheet1
-            except gspread.SpreadsheetNotFound:
-                st.warning("Spreadsheet 'Data Scan' tidak ditemukan/belum dishare.")
-                sheet = None
-            
-            if sheet:
-                sheet.append_row([timestamp, operator_nik, operator_name, component_number, item_name, quantity, reason])
-                st.toast(f"✅ Saved to Google Sheets")
+            # One API call for all lines
+            append_sheet_rows(client, sheet_rows)
+            st.toast(f"✅ Saved to Google Sheets ({len(sheet_rows)} baris)")
+        except gspread.SpreadsheetNotFound:
+            st.warning(f"Spreadsheet '{SHEET_NAME}' tidak ditemukan/belum dishare.")
         except Exception as e:
             st.error(f"❌ GSheets Error: {e}")
     else:
         st.warning("⚠️ Google Sheets offline.")
 
-    # 2. Local Excel (Per User/NIK)
-    try:
-        # Construct filename based on Session NIK (usually 'general' or logged in user)
-        # We use session_nik for the filename to keep files organized by the device/session user if needed,
-        # or we could use operator_nik. But usually session_nik is safer for file locking if multiple people use same device?
-        # Let's stick to session_nik for filename but save operator_nik inside.
-        safe_nik = session_nik if session_nik else "unknown"
-        file_path_xlsx = f"data_{safe_nik}.xlsx"
-        
-        df_new = pd.DataFrame([new_row])
-        
-        if os.path.exists(file_path_xlsx):
-            df_existing = pd.read_excel(file_path_xlsx)
-            df_final = pd.concat([df_existing, df_new], ignore_index=True)
-        else:
-            df_final = df_new
-        df_final.to_excel(file_path_xlsx, index=False)
-        st.toast(f"✅ Saved to Excel ({safe_nik})")
-    except Exception as e:
-        st.error(f"❌ Excel Error: {e}")
-        
-        # 3. CSV Fallback
-        try:
-            safe_nik = session_nik if session_nik else "unknown"
-            file_path_csv = f"data_{safe_nik}.csv"
-            mode = 'a' if os.path.exists(file_path_csv) else 'w'
-            header = not os.path.exists(file_path_csv)
-            df_new.to_csv(file_path_csv, mode=mode, header=header, index=False)
-            st.toast(f"✅ Saved to CSV ({safe_nik})")
-        except Exception:
-            pass
+    # 2. Local Excel (Per User/NIK), 3. CSV Fallback
+    saved_as, safe_nik, excel_error = write_local_rows(new_rows, session_nik)
+    if excel_error is not None:
+        st.error(f"❌ Excel Error: {excel_error}")
+    if saved_as:
+        st.toast(f"✅ Saved to {saved_as} ({safe_nik})")
 
 # --- GOOGLE SHEETS HELPER FUNCTIONS ---
 def get_worksheet():
     client = get_gspread_client()
     if client:
         try:
-            return client.open("Data Scan").sheet1
+            return client.open(SHEET_NAME).sheet1
         except gspread.SpreadsheetNotFound:
             st.error("❌ Spreadsheet 'Data Scan' tidak ditemukan.")
             return None
@@ -139,48 +134,7 @@ def load_data_gsheet():
     if sheet:
         try:
             # Use get_all_values to get raw list of lists
-            raw_data = sheet.get_all_values()
-            if not raw_data:
-                return pd.DataFrame()
-                
-            # Define expected columns based on save_data order
-            # [Timestamp, NIK Operator, Nama Operator, Component Number, Nama Barang, Quantity, Keterangan]
-            expected_cols = ["Timestamp", "NIK Operator", "Nama Operator", "Component Number", "Nama Barang", "Quantity", "Keterangan"]
-            
-            # Check if first row is header
-            first_row = raw_data[0]
-            # Simple heuristic: Check if "Timestamp" is in the first row (case-insensitive)
-            is_header = False
-            if len(first_row) > 0 and "timestamp" in str(first_row[0]).lower():
-                is_header = True
-            
-            data_rows = raw_data[1:] if is_header else raw_data
-            
-            if not data_rows:
-                 return pd.DataFrame(columns=expected_cols)
-
-            # Create DataFrame
-            # We need to ensure we have enough columns. Pad if necessary.
-            # It's safer to create a list of dicts or just DataFrame from list and rename columns by index
-            df = pd.DataFrame(data_rows)
-            
-            # Rename columns by index (up to len(expected_cols))
-            # If df has more columns, keep them or drop? Let's keep first 7 as known.
-            # If df has fewer, we have a problem, but we can try to map what we have.
-            
-            current_cols = df.columns.tolist()
-            mapping = {}
-            for i in range(min(len(current_cols), len(expected_cols))):
-                mapping[current_cols[i]] = expected_cols[i]
-                
-            df = df.rename(columns=mapping)
-            
-            # Ensure all expected columns exist
-            for col in expected_cols:
-                if col not in df.columns:
-                    df[col] = ""
-                    
-            return df
+            return parse_history_values(sheet.get_all_values())
         except Exception as e:
             st.error(f"❌ Gagal memuat data dari Google Sheets: {e}")
             return pd.DataFrame()
@@ -215,12 +169,20 @@ def delete_data_gsheet(timestamps_to_delete):
         if not rows_to_delete:
             st.warning("⚠️ Data tidak ditemukan di Google Sheets untuk dihapus.")
             return True
+        
+        # Group contiguous rows (e.g. all lines of one cart) into runs: one API call per run
+        runs = []
+        for row_num in rows_to_delete:
+            if runs and runs[-1][0] == row_num + 1:
+                runs[-1][0] = row_num
+            else:
+                runs.append([row_num, row_num]) # [start, end], descending order
             
         progress_bar = st.progress(0)
-        total = len(rows_to_delete)
+        total = len(runs)
         
-        for idx, row_num in enumerate(rows_to_delete):
-            sheet.delete_rows(row_num)
+        for idx, (start_row, end_row) in enumerate(runs):
+            sheet.delete_rows(start_row, end_row)
             progress_bar.progress((idx + 1) / total)
             
         return True
@@ -228,6 +190,202 @@ def delete_data_gsheet(timestamps_to_delete):
         st.error(f"❌ Error saat menghapus di Google Sheets: {e}")
         return False
 
+# --- MASTER DATA (Hot Reload, see scanner_core.MasterFile) ---
+@st.cache_resource
+def get_master_files():
+    return {
+        'parts': MasterFile("Data_sparepart.csv", "Material", "Material Description"),
+        'operators': MasterFile("operator.csv", "Personnel Number", "Name"),
+    }
+
+# --- HISTORY EXPORT (Streaming) ---
+EXPORT_COLUMNS = ["Timestamp", "NIK Operator", "Nama Operator", "Component Number", "Nama Barang", "Quantity", "Keterangan"]
+EXPORT_CHUNK_ROWS = 5000 # Rows fetched from Google Sheets per request
+
+def iter_gsheet_chunks(sheet, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yields the sheet as DataFrames of at most chunk_rows rows, using ranged reads
+    so the whole history is never held in memory at once.
+    """
+    last_col = chr(ord('A') + len(EXPORT_COLUMNS) - 1)
+    # Ranges past the grid are rejected by the API ("exceeds grid limits")
+    max_rows = sheet.row_count
+    start = 1
+    while start <= max_rows:
+        end = min(start + chunk_rows - 1, max_rows)
+        raw_rows = sheet.get(f"A{start}:{last_col}{end}")
+        if not raw_rows:
+            break
+        fetched = len(raw_rows)
+        
+        # Skip header row (same heuristic as load_data_gsheet)
+        if start == 1 and raw_rows[0] and "timestamp" in str(raw_rows[0][0]).lower():
+            raw_rows = raw_rows[1:]
+        
+        # Pad short rows (trailing empty cells are not returned by the API)
+        rows = [list(r) + [""] * (len(EXPORT_COLUMNS) - len(r)) for r in raw_rows]
+        if rows:
+            yield pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+        
+        if fetched < end - start + 1:
+            break
+        start = end + 1
+
+def filter_export_chunk(df, date_from, date_to, nik="", component=""):
+    ts = pd.to_datetime(df['Timestamp'], errors='coerce')
+    mask = (ts.dt.date >= date_from) & (ts.dt.date <= date_to)
+    if nik:
+        mask &= df['NIK Operator'].astype(str) == nik
+    if component:
+        mask &= df['Component Number'].astype(str) == component
+    return df[mask]
+
+def export_history(file_path, fmt, date_from, date_to, nik="", component=""):
+    """
+    Streams filtered history from Google Sheets into file_path chunk by chunk.
+    Args:
+        fmt (str): 'CSV', 'Excel' or 'Parquet'.
+    Returns:
+        int: Number of exported rows, or None if the export failed.
+    """
+    sheet = get_worksheet()
+    if not sheet:
+        return None
+    
+    total = 0
+    try:
+        if fmt == "CSV":
+            pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(file_path, index=False)
+            for chunk in iter_gsheet_chunks(sheet):
+                chunk = filter_export_chunk(chunk, date_from, date_to, nik, component)
+                chunk.to_csv(file_path, mode='a', header=False, index=False)
+                total += len(chunk)
+        
+        elif fmt == "Excel":
+            from openpyxl import Workbook
+            # write_only streams rows to disk instead of building the sheet in memory
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Riwayat")
+            ws.append(EXPORT_COLUMNS)
+            for chunk in iter_gsheet_chunks(sheet):
+                chunk = filter_export_chunk(chunk, date_from, date_to, nik, component)
+                for row in chunk.itertuples(index=False):
+                    ws.append(list(row))
+                total += len(chunk)
+            wb.save(file_path)
+        
+        elif fmt == "Parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                st.error("⚠️ Export Parquet butuh paket 'pyarrow'.")
+                return None
+            schema = pa.schema([(col, pa.string()) for col in EXPORT_COLUMNS])
+            with pq.ParquetWriter(file_path, schema, compression='snappy') as writer:
+                for chunk in iter_gsheet_chunks(sheet):
+                    chunk = filter_export_chunk(chunk, date_from, date_to, nik, component)
+                    if not chunk.empty:
+                        writer.write_table(pa.Table.from_pandas(chunk.astype(str), schema=schema, preserve_index=False))
+                    total += len(chunk)
+        return total
+    except Exception as e:
+        st.error(f"❌ Gagal export data: {e}")
+        return None
+
+# --- IMAGE ARCHIVE (Scan Evidence) ---
+# Captures are stored downscaled and named by content hash, so the same photo is kept once.
+IMAGE_ARCHIVE_DIR = "scan_images"
+IMAGE_ARCHIVE_MAX_SIDE = 1024 # px, longest side after downscale
+IMAGE_ARCHIVE_QUALITY = 80
+IMAGE_ARCHIVE_MAX_MB = 500 # Total disk budget, oldest files are evicted first
+IMAGE_ARCHIVE_MAX_DAYS = 180 # Retention period
+
+@st.cache_resource
+def get_archive_executor():
+    # Single worker: writes are serialized so eviction never races with itself
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-archive")
+
+def _archive_format():
+    try:
+        from PIL import features
+        if features.check('webp'):
+            return 'WEBP', 'webp'
+    except Exception:
+        pass
+    return 'JPEG', 'jpg'
+
+def _write_archive_image(image, file_path, fmt):
+    try:
+        if os.path.exists(file_path):
+            # Duplicate capture: refresh mtime so it counts as recently used
+            os.utime(file_path, None)
+        else:
+            os.makedirs(IMAGE_ARCHIVE_DIR, exist_ok=True)
+            image = image.convert('RGB')
+            image.thumbnail((IMAGE_ARCHIVE_MAX_SIDE, IMAGE_ARCHIVE_MAX_SIDE))
+            tmp_path = file_path + ".tmp"
+            image.save(tmp_path, format=fmt, quality=IMAGE_ARCHIVE_QUALITY)
+            os.replace(tmp_path, file_path) # Atomic, readers never see a half-written file
+        evict_image_archive()
+    except Exception:
+        pass # Archiving must never break the scan flow
+
+def evict_image_archive():
+    """
+    Applies the retention policy to the image archive.
+    Files older than IMAGE_ARCHIVE_MAX_DAYS are removed, then the oldest files
+    are removed until the archive fits in IMAGE_ARCHIVE_MAX_MB.
+    """
+    if not os.path.isdir(IMAGE_ARCHIVE_DIR):
+        return
+    
+    now = time.time()
+    max_age = IMAGE_ARCHIVE_MAX_DAYS * 86400
+    files = []
+    for entry in os.scandir(IMAGE_ARCHIVE_DIR):
+        if not entry.is_file() or entry.name.endswith(".tmp"):
+            continue
+        stat = entry.stat()
+        if now - stat.st_mtime > max_age:
+            try: os.remove(entry.path)
+            except OSError: pass
+        else:
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    total = sum(size for _, size, _ in files)
+    budget = IMAGE_ARCHIVE_MAX_MB * 1024 * 1024
+    if total <= budget:
+        return
+    
+    files.sort() # Oldest first
+    for _, size, path in files:
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def archive_image(image, image_bytes):
+    """
+    Queues a capture for the image archive and returns its archive name.
+    The name is derived from the SHA-256 of the raw capture; encoding and
+    writing happen in the background so the save path is not slowed down.
+    Args:
+        image (PIL.Image): Decoded capture.
+        image_bytes (bytes): Raw capture bytes, used for the content hash.
+    """
+    fmt, ext = _archive_format()
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    image_name = f"{digest[:32]}.{ext}"
+    file_path = os.path.join(IMAGE_ARCHIVE_DIR, image_name)
+    
+    # Copy so the worker does not share the file buffer with the UI thread
+    get_archive_executor().submit(_write_archive_image, image.copy(), file_path, fmt)
+    return image_name
+
 # --- OCR ENGINE SETUP ---
 try:
     import cv2
@@ -237,9 +395,13 @@ except ImportError:
 @st.cache_resource
 def load_reader():
     try:
-        import easyocr
+        # Backend & thread count are chosen via OCR_BACKEND / OCR_THREADS (see ocr_backend.py)
+        from ocr_backend import create_reader, OCR_BACKEND
         with st.spinner("Loading OCR Engine..."):
-            return easyocr.Reader(['en'])
+            ocr_reader = create_reader()
+        if getattr(ocr_reader, 'ocr_backend', OCR_BACKEND) != OCR_BACKEND:
+            st.warning(f"⚠️ OCR backend '{OCR_BACKEND}' gagal dimuat, memakai '{ocr_reader.ocr_backend}'.")
+        return ocr_reader
     except ImportError:
         return None
 
@@ -261,6 +423,77 @@ def ocr_space_api(image_bytes, api_key='helloworld', language='eng'):
         return {"IsErroredOnProcessing": True, "ErrorMessage": [str(e)]}
 
 
+# --- LIVE SCANNER (Continuous) ---
+try:
+    from streamlit_webrtc import webrtc_streamer, WebRtcMode, VideoProcessorBase
+except ImportError:
+    webrtc_streamer = None
+    VideoProcessorBase = object
+
+LIVE_PROCESS_EVERY_N = 3 # Only every Nth frame is inspected
+LIVE_MOTION_THRESHOLD = 6.0 # Mean abs. pixel diff between inspected frames, above = still moving
+LIVE_BLUR_THRESHOLD = 100.0 # Laplacian variance, below = too blurry for OCR
+LIVE_POLL_TIMEOUT = 120 # Seconds the script run waits for a code before giving up
+
+class LiveScanProcessor(VideoProcessorBase):
+    """
+    Runs OCR on the live stream only when the frame is stable and sharp.
+    Frames arriving while a recognition is running are dropped, and processing
+    stops once a code from the catalog is found (see self.result).
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.valid_codes = frozenset() # Filled from the catalog by the UI thread
+        self.catalog_version = None # Catalog snapshot version valid_codes was built from
+        self.result = None # (code, rgb_frame) once a catalog code is found
+        self.last_text = ""
+        self.gate_state = "Menunggu kamera..." # Shown in the UI while polling
+        self._frame_count = 0
+        self._prev_small = None
+        self._busy = threading.Lock()
+
+    def recv(self, frame):
+        if self.result is None and self.valid_codes:
+            self._frame_count += 1
+            if self._frame_count % LIVE_PROCESS_EVERY_N == 0:
+                self._gate(frame.to_ndarray(format="bgr24"))
+        return frame
+
+    def _gate(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (160, 120))
+        prev, self._prev_small = self._prev_small, small
+        if prev is None:
+            return
+        
+        # 1. Motion gate
+        if cv2.absdiff(small, prev).mean() > LIVE_MOTION_THRESHOLD:
+            self.gate_state = "Kamera bergerak, tahan label..."
+            return
+        # 2. Blur gate
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < LIVE_BLUR_THRESHOLD:
+            self.gate_state = "Gambar buram, dekatkan / fokuskan label..."
+            return
+        # 3. Drop frame if a recognition is still in progress
+        if not self._busy.acquire(blocking=False):
+            return
+        self.gate_state = "Membaca teks..."
+        threading.Thread(target=self._recognize, args=(img.copy(),), daemon=True).start()
+
+    def _recognize(self, img):
+        try:
+            rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            res = self.reader.readtext(rgb, detail=0)
+            self.last_text = " ".join(res)
+            for code in re.findall(r'\d{7}', self.last_text):
+                if code in self.valid_codes:
+                    self.result = (code, rgb)
+                    break
+        except Exception:
+            pass
+        finally:
+            self._busy.release()
+
 # --- MAIN UI LOGIC ---
 
 # Bypass Login
@@ -281,7 +514,7 @@ st.sidebar.title("Menu")
 
 
 
-page = st.sidebar.radio("Pilih Halaman:", ["Scanner", "Riwayat Pengambilan"])
+page = st.sidebar.radio("Pilih Halaman:", ["Scanner", "Riwayat Pengambilan", "Export Data"])
 
 if page == "Scanner":
     st.title("📷 Scanner Komponen")
@@ -292,15 +525,31 @@ if page == "Scanner":
     with col1:
         st.subheader("1. Input Data")
         # Removed "Upload Foto" option
-        input_method = st.radio("Metode:", ["Scan Kamera", "Input Manual / Ketik"], horizontal=True, label_visibility="collapsed")
+        input_method = st.radio("Metode:", ["Scan Kamera", "Scan Live (Otomatis)", "Input Manual / Ketik"], horizontal=True, label_visibility="collapsed")
         
         img_file_buffer = None
         manual_code_input = ""
+        live_ctx = None
         
         if input_method == "Scan Kamera":
-            img_file_buffer = st.camera_input("Ambil Foto")
+            img_file_buffer = st.camera_input("Ambil Foto", key=f"camera_input_{st.session_state['input_nonce']}")
+        elif input_method == "Scan Live (Otomatis)":
+            if webrtc_streamer is None or cv2 is None:
+                st.warning("⚠️ Scan Live butuh paket 'streamlit-webrtc' dan 'opencv-python-headless'.")
+            elif reader is None:
+                st.warning("⚠️ OCR Engine tidak tersedia.")
+            else:
+                live_ctx = webrtc_streamer(
+                    key="live_scan",
+                    mode=WebRtcMode.SENDRECV,
+                    video_processor_factory=lambda: LiveScanProcessor(reader),
+                    media_stream_constraints={"video": {"width": 640, "height": 480}, "audio": False},
+                    # Stop the camera once a code is locked in, resume on its own after save / reset (hands-free)
+                    desired_playing_state=st.session_state['current_scan'] is None,
+                    async_processing=True
+                )
         elif input_method == "Input Manual / Ketik":
-            manual_code_input = st.text_input("Masukkan Kode (7 Digit):", max_chars=7)
+            manual_code_input = st.text_input("Masukkan Kode (7 Digit):", max_chars=7, key=f"manual_code_{st.session_state['input_nonce']}")
     
         # Reset current scan if raw input changes (simple heuristic)
         # Note: In Streamlit, camera_input triggers rerun on every snap.
@@ -312,62 +561,25 @@ if page == "Scanner":
         valid_part = False
         part_description = ""
         
-        # Load Database (Cached)
-        @st.cache_data
-        def load_spareparts_db():
-            db_path = "Data_sparepart.csv"
-            if os.path.exists(db_path):
-                try:
-                    # Read as string to ensure matching works correctly
-                    df_db = pd.read_csv(db_path, dtype=str)
-                    return df_db
-                except Exception:
-                    return None
-            return None
-    
-        df_parts = load_spareparts_db()
-    
-        # --- DATABASE VALIDATION ---
-        valid_part = False
-        part_description = ""
+        # Load Databases (hot-reloaded when the CSV files change)
+        for master_key, master_label in [('parts', "Katalog"), ('operators', "Data operator")]:
+            snapshot = get_master_files()[master_key].get()
+            seen_key = f"master_version_{master_key}"
+            if st.session_state.get(seen_key, snapshot.version) < snapshot.version and snapshot.diff:
+                st.toast(f"🔄 {master_label} diperbarui: +{snapshot.diff['added']} / -{snapshot.diff['removed']} / ~{snapshot.diff['changed']}")
+            st.session_state[seen_key] = snapshot.version
         
-        # Load Spareparts Database (Cached)
-        @st.cache_data
-        def load_spareparts_db():
-            db_path = "Data_sparepart.csv"
-            if os.path.exists(db_path):
-                try:
-                    df_db = pd.read_csv(db_path, dtype=str)
-                    return df_db
-                except Exception:
-                    return None
-            return None
-    
-        # Load Operator Database (Cached)
-        @st.cache_data
-        def load_operator_db():
-            db_path = "operator.csv"
-            if os.path.exists(db_path):
-                try:
-                    # Assuming columns: Personnel Number, Salutation, Name
-                    df_op = pd.read_csv(db_path, dtype=str)
-                    return df_op
-                except Exception:
-                    return None
-            return None
-    
-        df_parts = load_spareparts_db()
-        df_operators = load_operator_db()
+        parts_db = get_master_files()['parts'].get() # Material -> Material Description
+        operators_db = get_master_files()['operators'].get() # Personnel Number -> Name
     
         # --- HANDLING MANUAL INPUT ---
         if input_method == "Input Manual / Ketik" and manual_code_input:
             if len(manual_code_input) == 7 and manual_code_input.isdigit():
                  # Validate against DB
-                 if df_parts is not None:
-                     part_match = df_parts[df_parts['Material'] == manual_code_input]
-                     if not part_match.empty:
+                 if parts_db.loaded:
+                     if manual_code_input in parts_db.index:
                          valid_part = True
-                         part_description = part_match.iloc[0]['Material Description']
+                         part_description = parts_db.index[manual_code_input]
                      else:
                          st.error(f"❌ Komponen {manual_code_input} tidak ditemukan di database!")
                  else:
@@ -414,13 +626,12 @@ if page == "Scanner":
                         found_number = matches[0]
                         
                         # Validate against DB
-                        if df_parts is not None:
-                            part_match = df_parts[df_parts['Material'] == found_number]
-                            if not part_match.empty:
-                                part_description = part_match.iloc[0]['Material Description']
+                        if parts_db.loaded:
+                            if found_number in parts_db.index:
+                                part_description = parts_db.index[found_number]
                                 st.session_state['current_scan'] = {
                                     'number': found_number,
-                                    'image_name': getattr(img_file_buffer, 'name', 'camera_capture.jpg'),
+                                    'image_name': archive_image(image, img_file_buffer.getvalue()),
                                     'description': part_description
                                 }
                                 st.rerun() # Force rerun to show the form
@@ -441,96 +652,208 @@ if page == "Scanner":
             if 'description' in scan_data:
                 st.info(f"📦 {scan_data['description']}")
                 
-            # --- NIK INPUT & VALIDATION (Outside Form for interactivity) ---
-            st.caption("Masukkan Detail Pengambil:")
-            input_nik = st.text_input("NIK Operator (6 Digit)", max_chars=6, placeholder="Contoh: 123456", key="nik_input")
+            # Pick cart: NIK & reason are entered once at checkout, not per item
+            pick_mode = st.radio("Mode Simpan:", ["Simpan Langsung", "Masukkan Keranjang"], horizontal=True, key="pick_mode")
             
-            valid_nik = False
-            operator_name = ""
+            if pick_mode == "Masukkan Keranjang":
+                with st.form("cart_item_form"):
+                    qty = st.number_input("Jumlah (Pcs)", min_value=1, value=1)
+                    
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        if st.form_submit_button("🛒 TAMBAH KE KERANJANG"):
+                            cart = st.session_state['cart']
+                            for cart_item in cart:
+                                if cart_item['number'] == scan_data['number']:
+                                    cart_item['qty'] += qty
+                                    break
+                            else:
+                                cart.append({
+                                    'number': scan_data['number'],
+                                    'description': scan_data.get('description', ''),
+                                    'qty': qty,
+                                    'image_name': scan_data['image_name']
+                                })
+                            reset_scan()
+                            st.rerun()
+                    
+                    with c2:
+                        if st.form_submit_button("❌ BATAL / RESET"):
+                            reset_scan()
+                            st.rerun()
+            else:
+                # --- NIK INPUT & VALIDATION (Outside Form for interactivity) ---
+                st.caption("Masukkan Detail Pengambil:")
+                input_nik = st.text_input("NIK Operator (6 Digit)", max_chars=6, placeholder="Contoh: 123456", key="nik_input")
             
-            if input_nik and len(input_nik) == 6 and input_nik.isdigit():
-                if df_operators is not None:
-                    op_match = df_operators[df_operators['Personnel Number'] == input_nik]
-                    if not op_match.empty:
-                        valid_nik = True
-                        operator_name = op_match.iloc[0]['Name']
-                        st.info(f"👤 Operator: **{operator_name}**")
+                valid_nik = False
+                operator_name = ""
+            
+                if input_nik and len(input_nik) == 6 and input_nik.isdigit():
+                    if operators_db.loaded:
+                        if input_nik in operators_db.index:
+                            valid_nik = True
+                            operator_name = operators_db.index[input_nik]
+                            st.info(f"👤 Operator: **{operator_name}**")
                         
-                        # --- SHOW HISTORY FOR THIS NIK ---
-                        # Load current data file
-                        nik_str = st.session_state['user_nik']
-                        user_file_xlsx = f"data_{nik_str}.xlsx"
-                        user_file_csv = f"data_{nik_str}.csv"
-                        df_history = pd.DataFrame()
+                            # --- SHOW HISTORY FOR THIS NIK ---
+                            # Load current data file
+                            nik_str = st.session_state['user_nik']
+                            user_file_xlsx = f"data_{nik_str}.xlsx"
+                            user_file_csv = f"data_{nik_str}.csv"
+                            df_history = pd.DataFrame()
                         
-                        if os.path.exists(user_file_xlsx):
-                            try: df_history = pd.read_excel(user_file_xlsx)
-                            except: pass
-                        elif os.path.exists(user_file_csv):
-                            try: df_history = pd.read_csv(user_file_csv)
-                            except: pass
+                            if os.path.exists(user_file_xlsx):
+                                try: df_history = pd.read_excel(user_file_xlsx)
+                                except: pass
+                            elif os.path.exists(user_file_csv):
+                                try: df_history = pd.read_csv(user_file_csv)
+                                except: pass
                             
-                        if not df_history.empty and "NIK Operator" in df_history.columns:
-                            # Filter by NIK (ensure string comparison)
-                            df_history['NIK Operator'] = df_history['NIK Operator'].astype(str)
-                            user_history = df_history[df_history['NIK Operator'] == input_nik]
+                            if not df_history.empty and "NIK Operator" in df_history.columns:
+                                # Filter by NIK (ensure string comparison)
+                                df_history['NIK Operator'] = df_history['NIK Operator'].astype(str)
+                                user_history = df_history[df_history['NIK Operator'] == input_nik]
                             
-                            if not user_history.empty:
-                                with st.expander(f"Riwayat Pengambilan ({len(user_history)})"):
-                                    st.dataframe(user_history[['Timestamp', 'Nama Barang', 'Quantity']].sort_values(by="Timestamp", ascending=False).head(5))
+                                if not user_history.empty:
+                                    with st.expander(f"Riwayat Pengambilan ({len(user_history)})"):
+                                        st.dataframe(user_history[['Timestamp', 'Nama Barang', 'Quantity']].sort_values(by="Timestamp", ascending=False).head(5))
+                                else:
+                                    st.caption("Belum ada riwayat pengambilan.")
+                        else:
+                            st.error("❌ NIK tidak terdaftar!")
+                    else:
+                        st.warning("⚠️ Database operator tidak ditemukan.")
+                        valid_nik = True # Allow if DB missing
+    
+                with st.form("save_form"):
+                    qty = st.number_input("Jumlah (Pcs)", min_value=1, value=1)
+                    reason = st.text_area("Keterangan / Keperluan:", placeholder="Contoh: Penggantian part mesin A...")
+                
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        if st.form_submit_button("💾 SIMPAN DATA"):
+                            if valid_nik:
+                                save_data(
+                                    scan_data['number'], 
+                                    input_nik, # Operator NIK
+                                    operator_name, # Operator Name
+                                    qty, 
+                                    scan_data.get('description', ''), # Item Name
+                                    scan_data['image_name'],
+                                    st.session_state['user_nik'], # Session NIK
+                                    reason # Reason
+                                )
+                                reset_scan()
+                                st.rerun()
                             else:
-                                st.caption("Belum ada riwayat pengambilan.")
+                                st.error("⚠️ NIK tidak valid!")
+                        
+                    with c2:
+                        if st.form_submit_button("❌ BATAL / RESET"):
+                            reset_scan()
+                            st.rerun()
+        
+        # --- PICK CART ---
+        if st.session_state['cart']:
+            st.divider()
+            cart = st.session_state['cart']
+            st.subheader(f"🛒 Keranjang ({len(cart)} item)")
+            st.dataframe(
+                pd.DataFrame(cart)[['number', 'description', 'qty']],
+                column_config={
+                    "number": "No. Komponen",
+                    "description": "Nama Komponen",
+                    "qty": "Qty"
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+            
+            cart_nik = st.text_input("NIK Operator (6 Digit)", max_chars=6, placeholder="Contoh: 123456", key="cart_nik_input")
+            
+            cart_valid_nik = False
+            cart_operator_name = ""
+            
+            if cart_nik and len(cart_nik) == 6 and cart_nik.isdigit():
+                if operators_db.loaded:
+                    if cart_nik in operators_db.index:
+                        cart_valid_nik = True
+                        cart_operator_name = operators_db.index[cart_nik]
+                        st.info(f"👤 Operator: **{cart_operator_name}**")
                     else:
                         st.error("❌ NIK tidak terdaftar!")
                 else:
                     st.warning("⚠️ Database operator tidak ditemukan.")
-                    valid_nik = True # Allow if DB missing
-    
-            with st.form("save_form"):
-                qty = st.number_input("Jumlah (Pcs)", min_value=1, value=1)
-                reason = st.text_area("Keterangan / Keperluan:", placeholder="Contoh: Penggantian part mesin A...")
+                    cart_valid_nik = True # Allow if DB missing
+            
+            with st.form("cart_form"):
+                cart_reason = st.text_area("Keterangan / Keperluan:", placeholder="Contoh: Penggantian part mesin A...", key="cart_reason")
                 
                 c1, c2 = st.columns(2)
                 with c1:
-                    if st.form_submit_button("💾 SIMPAN DATA"):
-                        if valid_nik:
-                            save_data(
-                                scan_data['number'], 
-                                input_nik, # Operator NIK
-                                operator_name, # Operator Name
-                                qty, 
-                                scan_data.get('description', ''), # Item Name
-                                scan_data['image_name'],
+                    if st.form_submit_button("💾 SIMPAN SEMUA"):
+                        if cart_valid_nik:
+                            save_data_batch(
+                                cart,
+                                cart_nik, # Operator NIK
+                                cart_operator_name, # Operator Name
                                 st.session_state['user_nik'], # Session NIK
-                                reason # Reason
+                                cart_reason # Reason
                             )
-                            st.session_state['current_scan'] = None # Reset
+                            st.session_state['cart'] = [] # Reset
                             st.rerun()
                         else:
                             st.error("⚠️ NIK tidak valid!")
-                        
+                
                 with c2:
-                    if st.form_submit_button("❌ BATAL / RESET"):
-                        st.session_state['current_scan'] = None
+                    if st.form_submit_button("🗑️ KOSONGKAN"):
+                        st.session_state['cart'] = []
                         st.rerun()
+        
+        # --- LIVE SCAN POLLING ---
+        # Kept last on the page: the loop blocks this script run until a code is found or the stream stops
+        if live_ctx is not None and st.session_state['current_scan'] is None:
+            live_status = st.empty()
+            poll_deadline = time.monotonic() + LIVE_POLL_TIMEOUT
+            while live_ctx.state.playing:
+                # live_ctx.state only changes on a new script run, and Streamlit only handles
+                # stop/rerun requests at st.* calls, so the placeholder is updated every iteration
+                if time.monotonic() > poll_deadline:
+                    live_status.caption("⏱️ Tidak ada kode terbaca.")
+                    st.button("🔄 Lanjutkan Scan Live") # Any click reruns the page and restarts polling
+                    break
+                processor = live_ctx.video_processor
+                if processor is not None:
+                    # Refresh valid codes when the catalog is hot-reloaded
+                    parts_snapshot = get_master_files()['parts'].get()
+                    if processor.catalog_version != parts_snapshot.version:
+                        processor.valid_codes = frozenset(parts_snapshot.index)
+                        processor.catalog_version = parts_snapshot.version
+                    
+                    if processor.result is not None:
+                        found_number, frame_rgb = processor.result
+                        st.session_state['current_scan'] = {
+                            'number': found_number,
+                            'image_name': archive_image(Image.fromarray(frame_rgb), frame_rgb.tobytes()),
+                            'description': parts_snapshot.index.get(found_number, "")
+                        }
+                        st.rerun()
+                    
+                    status_text = processor.gate_state
+                    if processor.last_text:
+                        status_text += f" | Teks terbaca: {processor.last_text}"
+                    live_status.caption(status_text)
+                else:
+                    live_status.caption("Menunggu kamera...")
+                time.sleep(0.2)
 
 elif page == "Riwayat Pengambilan":
     st.title("📜 Riwayat Pengambilan")
     st.caption("Data Realtime dari Google Sheets")
     
-    # Load Operator Database (Cached) for Mapping
-    @st.cache_data
-    def load_operator_db_history(): 
-        db_path = "operator.csv"
-        if os.path.exists(db_path):
-            try:
-                df_op = pd.read_csv(db_path, dtype=str)
-                return df_op
-            except Exception:
-                return None
-        return None
-    
-    df_operators = load_operator_db_history()
+    # Load Operator Database for Mapping
+    operators_db = get_master_files()['operators'].get()
     
     # --- FETCH DATA FROM GOOGLE SHEETS ---
     with st.spinner("Mengambil data riwayat dari Google Sheets..."):
@@ -566,9 +889,8 @@ elif page == "Riwayat Pengambilan":
             else:
                 # Fallback map
                 if 'NIK Operator' in df_filtered.columns:
-                    if df_operators is not None and 'Personnel Number' in df_operators.columns and 'Name' in df_operators.columns:
-                        nik_to_name = dict(zip(df_operators['Personnel Number'], df_operators['Name']))
-                        df_filtered['Operator'] = df_filtered['NIK Operator'].astype(str).map(nik_to_name).fillna(df_filtered['NIK Operator'])
+                    if operators_db.index:
+                        df_filtered['Operator'] = df_filtered['NIK Operator'].astype(str).map(operators_db.index).fillna(df_filtered['NIK Operator'])
                     else:
                         df_filtered['Operator'] = df_filtered['NIK Operator']
                 else:
@@ -607,13 +929,21 @@ elif page == "Riwayat Pengambilan":
             for c in ['Timestamp', 'Component Number', 'Nama Barang']:
                 if c not in df.columns: df[c] = "?"
                 
-            df['display_label'] = df['Timestamp'].astype(str) + " | " + df['Component Number'].astype(str) + " | " + df['Nama Barang'].astype(str)
+            # Rows are deleted by Timestamp, and all lines of one cart share a Timestamp,
+            # so each option is one transaction (a single pick or a whole cart)
+            options = []
+            for ts, group in df.groupby(df['Timestamp'].astype(str), sort=False):
+                if len(group) == 1:
+                    label = ts + " | " + str(group['Component Number'].iloc[0]) + " | " + str(group['Nama Barang'].iloc[0])
+                else:
+                    label = ts + " | Keranjang " + str(len(group)) + " item: " + ", ".join(group['Component Number'].astype(str))
+                options.append(label)
             
             # Show options (Newest First)
-            options = df['display_label'].tolist()[::-1]
+            options = options[::-1]
             
             selected_labels = st.multiselect(
-                "Pilih data yang ingin dihapus (Permanen):",
+                "Pilih data yang ingin dihapus (Permanen, keranjang dihapus seluruhnya):",
                 options=options
             )
             
@@ -626,7 +956,8 @@ elif page == "Riwayat Pengambilan":
                         success = delete_data_gsheet(timestamps_to_delete)
                     
                     if success:
-                        st.success(f"✅ {len(selected_labels)} data berhasil dihapus dari Google Sheets.")
+                        n_rows = int(df['Timestamp'].astype(str).isin(timestamps_to_delete).sum())
+                        st.success(f"✅ {len(selected_labels)} transaksi ({n_rows} baris) berhasil dihapus dari Google Sheets.")
                         
                         # --- LOCAL SYNC (Optional but recommended) ---
                         # Try to clean up local file too
@@ -656,3 +987,41 @@ elif page == "Riwayat Pengambilan":
                     st.warning("⚠️ Pilih data dahulu.")
     else:
         st.info("Belum ada data di Google Sheets.")
+
+elif page == "Export Data":
+    st.title("📤 Export Data")
+    # Separate page on purpose: the Riwayat page loads the whole sheet on every render,
+    # here rows are only streamed chunk by chunk when the export runs.
+    st.caption("Export riwayat dari Google Sheets untuk rentang tanggal tertentu")
+    
+    today = datetime.now().date()
+    c1, c2 = st.columns(2)
+    with c1:
+        export_from = st.date_input("Dari Tanggal", value=today.replace(day=1), key="export_from")
+        export_nik = st.text_input("Filter NIK (opsional)", max_chars=6, key="export_nik")
+    with c2:
+        export_to = st.date_input("Sampai Tanggal", value=today, key="export_to")
+        export_component = st.text_input("Filter No. Komponen (opsional)", max_chars=7, key="export_component")
+    export_fmt = st.radio("Format:", ["CSV", "Excel", "Parquet"], horizontal=True, key="export_fmt")
+    
+    if st.button("📤 Buat File Export"):
+        if export_from > export_to:
+            st.warning("⚠️ Tanggal awal melebihi tanggal akhir.")
+        else:
+            ext = {"CSV": "csv", "Excel": "xlsx", "Parquet": "parquet"}[export_fmt]
+            tmp = tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False)
+            tmp.close()
+            try:
+                with st.spinner("Mengekspor data dari Google Sheets..."):
+                    n_rows = export_history(tmp.name, export_fmt, export_from, export_to, export_nik.strip(), export_component.strip())
+                if n_rows is not None:
+                    st.success(f"✅ {n_rows} baris siap diunduh.")
+                    with open(tmp.name, 'rb') as f:
+                        st.download_button(
+                            "⬇️ Download",
+                            data=f,
+                            file_name=f"riwayat_{export_from:%Y%m%d}_{export_to:%Y%m%d}.{ext}"
+                        )
+            finally:
+                try: os.remove(tmp.name)
+                except OSError: pass
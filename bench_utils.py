@@ -0,0 +1,32 @@
+"""
+Helpers shared by the command-line tools load_test.py and ocr_benchmark.py.
+"""
+
+LABEL_FONT_SIZE = 48 # px, roughly the printed size of the material number on a label
+
+
+def _label_font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size) # Pillow >= 10.1
+    except TypeError:
+        try:
+            return ImageFont.truetype("DejaVuSans.ttf", size)
+        except OSError:
+            return ImageFont.load_default()
+
+
+def make_label_image(number, font_size=LABEL_FONT_SIZE):
+    """Synthetic label with a known material number, used as OCR ground truth."""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (480, 160), "white")
+    ImageDraw.Draw(img).text((30, 50), f"MAT {number}", fill="black", font=_label_font(font_size))
+    return img
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
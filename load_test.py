@@ -0,0 +1,241 @@
+"""
+Load test for the scanner app.
+
+Simulates N concurrent operators running lookup -> OCR -> save -> history
+cycles against an in-process stand-in for Google Sheets, and reports
+throughput, tail latency and error rate for each concurrency level.
+The cycle calls the same scanner_core functions as app.py; the fake client
+is passed where the app passes the client from get_gspread_client().
+
+Example:
+    python load_test.py --levels 1,2,4,8 --duration 20 --latency-ms 400 --quota-per-min 60
+    OCR_BACKEND=onnx OCR_THREADS=2 python load_test.py --levels 1,4 --ocr   (real OCR, CPU heavy)
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+from bench_utils import make_label_image, percentile
+from scanner_core import (
+    SHEET_NAME, build_batch_rows, append_sheet_rows, write_local_rows,
+    parse_history_values, MasterFile
+)
+
+
+# --- FAKE GOOGLE SHEETS BACKEND ---
+class FakeAPIError(Exception):
+    """Stand-in for gspread.exceptions.APIError (quota / server errors)."""
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+class FakeWorksheet:
+    """
+    Thread-safe in-memory worksheet with the subset of the gspread API used by app.py.
+    Args:
+        latency_ms (float): Mean latency per API call.
+        jitter_ms (float): Uniform +/- jitter added to each call.
+        quota_per_min (int): Max calls per rolling minute (0 = unlimited), like the Sheets per-user quota.
+        failure_rate (float): Probability that a call fails with a 500 error.
+    """
+    def __init__(self, latency_ms=300, jitter_ms=100, quota_per_min=60, failure_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.quota_per_min = quota_per_min
+        self.failure_rate = failure_rate
+        self.title = SHEET_NAME
+        self._rows = [["Timestamp", "NIK Operator", "Nama Operator", "Component Number", "Nama Barang", "Quantity", "Keterangan"]]
+        self._lock = threading.Lock()
+        self._calls = deque()
+
+    def _api_call(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.quota_per_min:
+                while self._calls and now - self._calls[0] > 60:
+                    self._calls.popleft()
+                if len(self._calls) >= self.quota_per_min:
+                    raise FakeAPIError(429, "Quota exceeded (requests per minute)")
+                self._calls.append(now)
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        time.sleep(delay / 1000.0)
+        if random.random() < self.failure_rate:
+            raise FakeAPIError(500, "Internal error encountered.")
+
+    def append_rows(self, values):
+        self._api_call()
+        with self._lock:
+            self._rows.extend([str(v) for v in row] for row in values)
+
+    def get_all_values(self):
+        self._api_call()
+        with self._lock:
+            return [list(row) for row in self._rows]
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.sheet1 = worksheet
+
+
+class FakeClient:
+    """Stand-in for the object returned by gspread.authorize()."""
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def open(self, title):
+        return FakeSpreadsheet(self._worksheet)
+
+
+# --- SIMULATED OPERATOR CYCLE ---
+def run_cycle(ctx, record):
+    """One lookup -> OCR -> save -> history cycle, mirroring the Scanner page."""
+    number = random.choice(ctx['numbers'])
+
+    # 1. Catalog lookup (hot-reloaded index, as on the Scanner page)
+    t0 = time.perf_counter()
+    description = ctx['parts'].get().index.get(number, "")
+    record('lookup', time.perf_counter() - t0, None)
+
+    # 2. OCR
+    if ctx['reader'] is not None:
+        import numpy as np
+        t0 = time.perf_counter()
+        err = None
+        try:
+            ctx['reader'].readtext(np.array(make_label_image(number)), detail=0)
+        except Exception as e:
+            err = e
+        record('ocr', time.perf_counter() - t0, err)
+
+    # 3. Save (same steps as save_data_batch)
+    item = {'number': number, 'description': description, 'qty': 1, 'image_name': "Load Test"}
+    new_rows, sheet_rows = build_batch_rows([item], random.choice(ctx['niks']), "Load Test", "load test")
+    t0 = time.perf_counter()
+    err = None
+    try:
+        append_sheet_rows(ctx['client'], sheet_rows)
+    except Exception as e:
+        err = e
+    record('sheets_append', time.perf_counter() - t0, err)
+
+    t0 = time.perf_counter()
+    # excel_error is set whenever the Excel rewrite failed, even if the CSV fallback worked
+    _, _, excel_error = write_local_rows(new_rows, "general", base_dir=ctx['workdir'])
+    record('excel_rewrite', time.perf_counter() - t0, excel_error)
+
+    # 4. History (Riwayat page reads and parses the whole sheet)
+    t0 = time.perf_counter()
+    err = None
+    try:
+        parse_history_values(ctx['client'].open(SHEET_NAME).sheet1.get_all_values())
+    except Exception as e:
+        err = e
+    record('history', time.perf_counter() - t0, err)
+
+
+def run_level(concurrency, duration, ctx):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    error_kinds = defaultdict(int)
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def record(stage, elapsed, err):
+        with lock:
+            latencies[stage].append(elapsed)
+            if err is not None:
+                errors[stage] += 1
+                error_kinds[type(err).__name__ + (f" {err.code}" if hasattr(err, 'code') else "")] += 1
+
+    def operator():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            run_cycle(ctx, record)
+            record('cycle', time.perf_counter() - t0, None)
+
+    threads = [threading.Thread(target=operator, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return latencies, errors, error_kinds, elapsed
+
+
+def print_report(concurrency, latencies, errors, error_kinds, elapsed):
+    cycles = len(latencies['cycle'])
+    failed = sum(errors.values())
+    print(f"\n=== {concurrency} operator(s) | {cycles} cycles in {elapsed:.1f}s | {cycles / elapsed:.2f} cycles/s ===")
+    print(f"{'stage':<15}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'err %':>8}")
+    for stage in ['lookup', 'ocr', 'sheets_append', 'excel_rewrite', 'history', 'cycle']:
+        values = latencies.get(stage)
+        if not values:
+            continue
+        err_pct = 100.0 * errors.get(stage, 0) / len(values)
+        print(f"{stage:<15}{len(values):>7}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}{err_pct:>8.1f}")
+    if failed:
+        kinds = ", ".join(f"{k} x{v}" for k, v in sorted(error_kinds.items()))
+        print(f"errors: {kinds}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test Scanner Komponen dengan fake Google Sheets.")
+    parser.add_argument("--levels", default="1,2,4,8", help="Concurrency levels, comma separated")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per level")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mean Sheets API latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Sheets API latency jitter (+/-)")
+    parser.add_argument("--quota-per-min", type=int, default=60, help="Sheets calls per minute, 0 = unlimited")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of a 500 error per call")
+    parser.add_argument("--ocr", action="store_true", help="Run the real OCR reader (OCR_BACKEND / OCR_THREADS) in each cycle")
+    args = parser.parse_args()
+
+    parts = MasterFile("Data_sparepart.csv", "Material", "Material Description")
+    operators = MasterFile("operator.csv", "Personnel Number", "Name")
+    numbers = list(parts.get().index) or ["5000654"]
+    niks = list(operators.get().index)
+
+    reader = None
+    if args.ocr:
+        try:
+            # Same reader the app builds, so OCR_BACKEND / OCR_THREADS apply here too
+            from ocr_backend import create_reader
+            print("⏳ Loading OCR Engine...")
+            reader = create_reader()
+            print(f"   Backend: {reader.ocr_backend}")
+        except ImportError:
+            print("⚠️ EasyOCR tidak terinstall, tahap OCR dilewati.")
+
+    workdir = tempfile.mkdtemp(prefix="scanner_loadtest_")
+    try:
+        for level in [int(x) for x in args.levels.split(",") if x.strip()]:
+            # Fresh backend per level so quota and sheet size do not leak between levels
+            worksheet = FakeWorksheet(args.latency_ms, args.jitter_ms, args.quota_per_min, args.failure_rate)
+            level_dir = os.path.join(workdir, f"level_{level}")
+            os.makedirs(level_dir)
+            ctx = {
+                'parts': parts,
+                'numbers': numbers,
+                'niks': niks or ["000000"],
+                'reader': reader,
+                'client': FakeClient(worksheet),
+                'workdir': level_dir, # All operators share one data_general.xlsx, like stations on one host
+            }
+            print_report(level, *run_level(level, args.duration, ctx))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+OCR engine backends for CPU-only kiosks.
+
+Selected through environment variables:
+    OCR_BACKEND   torch       EasyOCR as before (default). On CPU, EasyOCR already
+                              applies int8 dynamic quantization to its recognizer.
+                  torch-fp32  EasyOCR without quantization, the reference for accuracy checks.
+                  onnx        CRAFT text detector exported to ONNX, int8 dynamically quantized
+                              and run with onnxruntime. The recognizer stays EasyOCR's
+                              quantized model.
+    OCR_THREADS   CPU threads for inference (0 = library default)
+    OCR_ONNX_DIR  Where the exported ONNX detector is cached (default: models)
+"""
+import os
+import warnings
+
+
+def _env_int(name, default=0):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        warnings.warn(f"{name} is not an integer, using {default}")
+        return default
+
+
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "torch")
+OCR_THREADS = _env_int("OCR_THREADS", 0)
+ONNX_MODEL_DIR = os.environ.get("OCR_ONNX_DIR", "models")
+ONNX_DETECTOR_FILE = "craft_detector.int8.onnx"
+
+
+def set_threads(threads):
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+
+class OnnxDetector:
+    """
+    Drop-in replacement for reader.detector: EasyOCR calls it as net(x) with a
+    float tensor batch and expects (y, feature) tensors back.
+    """
+    def __init__(self, model_path, threads=0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        import torch
+        y, feature = self.session.run(None, {self.input_name: x.cpu().numpy()})
+        return torch.from_numpy(y), torch.from_numpy(feature)
+
+    def eval(self):
+        return self
+
+
+def export_detector(model_path, lang_list=('en',)):
+    """
+    Exports EasyOCR's full-precision CRAFT detector to ONNX (dynamic image size)
+    and writes an int8 dynamically quantized copy to model_path.
+    """
+    import easyocr
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    fp32_path = model_path.replace(".int8.onnx", ".fp32.onnx")
+
+    detector = easyocr.Reader(list(lang_list), gpu=False, quantize=False, recognizer=False).detector
+    detector.eval()
+    dummy = torch.randn(1, 3, 640, 640)
+    torch.onnx.export(
+        detector, dummy, fp32_path,
+        input_names=["image"], output_names=["y", "feature"],
+        dynamic_axes={
+            "image": {0: "batch", 2: "height", 3: "width"},
+            "y": {0: "batch", 1: "out_height", 2: "out_width"},
+            "feature": {0: "batch", 2: "out_height", 3: "out_width"},
+        },
+        opset_version=13,
+    )
+    tmp_path = model_path + ".tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QUInt8)
+    os.replace(tmp_path, model_path)
+    return model_path
+
+
+def create_reader(backend=None, threads=None, lang_list=('en',)):
+    """
+    Builds an EasyOCR-compatible reader (same readtext() API) for the given backend.
+    Falls back to the default torch backend if the ONNX backend cannot be built
+    (missing packages, failed export / quantization, corrupt cached model).
+    The backend actually in use is stored in reader.ocr_backend.
+    """
+    import easyocr
+    backend = backend or OCR_BACKEND
+    threads = OCR_THREADS if threads is None else threads
+    set_threads(threads)
+
+    if backend == "torch-fp32":
+        reader = easyocr.Reader(list(lang_list), gpu=False, quantize=False)
+        reader.ocr_backend = backend
+        return reader
+
+    if backend == "onnx":
+        try:
+            model_path = os.path.join(ONNX_MODEL_DIR, ONNX_DETECTOR_FILE)
+            if not os.path.exists(model_path):
+                export_detector(model_path, lang_list)
+            detector = OnnxDetector(model_path, threads)
+            # detector=False: the torch CRAFT model is never loaded, only the recognizer
+            reader = easyocr.Reader(list(lang_list), gpu=False, quantize=True, detector=False)
+            if not hasattr(reader, "get_textbox"):
+                # Set by EasyOCR only when it loads its own detector
+                from easyocr.detection import get_textbox
+                reader.get_textbox = get_textbox
+                reader.detect_network = "craft"
+            reader.detector = detector
+            reader.ocr_backend = backend
+            return reader
+        except Exception as e:
+            warnings.warn(f"ONNX OCR backend unavailable, falling back to torch: {e}")
+
+    reader = easyocr.Reader(list(lang_list))
+    reader.ocr_backend = "torch"
+    return reader
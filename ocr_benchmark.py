@@ -0,0 +1,122 @@
+"""
+Compares OCR backends (see ocr_backend.py) on latency, memory and accuracy.
+
+Accuracy is measured on the 7-digit component number extracted from each image,
+using the same regex as the Scanner page. Synthetic labels are scored against their
+true code; archive images (no ground truth) against the reference backend, the first
+one in --backends (default: torch, the current engine). An empty read always counts
+as a miss. Each backend runs in its own process so load time and peak memory are
+not mixed up.
+
+Example:
+    python ocr_benchmark.py --images scan_images --backends torch,onnx,torch-fp32 --threads 2
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_utils import make_label_image, percentile
+
+
+def load_images(image_dir, limit):
+    import numpy as np
+    from PIL import Image
+
+    images = []
+    if image_dir and os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir))[:limit]:
+            try:
+                images.append((name, np.array(Image.open(os.path.join(image_dir, name)).convert("RGB")), None))
+            except Exception:
+                pass
+    if not images:
+        # No archive yet: synthetic labels from the catalog
+        import pandas as pd
+        numbers = ["5000654", "5001007", "5019780"]
+        if os.path.exists("Data_sparepart.csv"):
+            numbers = pd.read_csv("Data_sparepart.csv", dtype=str)['Material'].dropna().tolist()[:limit] or numbers
+        images = [(f"synthetic_{n}", np.array(make_label_image(n)), n) for n in numbers]
+    return images
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 # KB on Linux
+    except ImportError:
+        return 0.0
+
+
+def bench_backend(backend, threads, image_dir, limit, warmup):
+    from ocr_backend import create_reader
+
+    images = load_images(image_dir, limit)
+    t0 = time.perf_counter()
+    reader = create_reader(backend, threads)
+    load_s = time.perf_counter() - t0
+
+    for _, img, _ in images[:warmup]:
+        reader.readtext(img, detail=0)
+
+    latencies = []
+    codes = {}
+    truth = {}
+    for name, img, true_code in images:
+        truth[name] = true_code
+        t0 = time.perf_counter()
+        text = " ".join(reader.readtext(img, detail=0))
+        latencies.append(time.perf_counter() - t0)
+        matches = re.findall(r'\d{7}', text)
+        codes[name] = matches[0] if matches else ""
+    return {
+        'load_s': load_s,
+        'latencies': latencies,
+        'codes': codes,
+        'truth': truth,
+        'rss_mb': peak_rss_mb(),
+        'detector': type(reader.detector).__name__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR backend Scanner Komponen.")
+    parser.add_argument("--images", default="scan_images", help="Folder of label images (default: image archive)")
+    parser.add_argument("--backends", default="torch,onnx,torch-fp32", help="First backend is the accuracy reference")
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads, 0 = library default")
+    parser.add_argument("--limit", type=int, default=50, help="Max images")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed warm-up images")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results = {}
+    for backend in backends:
+        print(f"⏳ {backend} ...")
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[backend] = pool.submit(bench_backend, backend, args.threads, args.images, args.limit, args.warmup).result()
+
+    reference = results[backends[0]]['codes']
+    truth = results[backends[0]]['truth']
+    # Expected code per image: ground truth for synthetic labels, else the reference read
+    expected = {k: truth.get(k) or reference.get(k, "") for k in reference}
+    print(f"\nReference: {backends[0]} | {len(reference)} images | threads={args.threads or 'default'}")
+    print(f"{'backend':<12}{'detector':<16}{'load s':>8}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}{'read %':>8}{'acc %':>8}")
+    for backend in backends:
+        r = results[backend]
+        n = len(r['codes']) or 1
+        read_pct = 100.0 * sum(1 for c in r['codes'].values() if c) / n
+        # Empty reads never count as a match, not even against an empty reference
+        agree_pct = 100.0 * sum(1 for k, c in r['codes'].items() if c and expected.get(k) == c) / n
+        print(f"{backend:<12}{r['detector']:<16}{r['load_s']:>8.1f}"
+              f"{percentile(r['latencies'], 50) * 1000:>10.1f}{percentile(r['latencies'], 95) * 1000:>10.1f}"
+              f"{r['rss_mb']:>10.0f}{read_pct:>8.1f}{agree_pct:>8.1f}")
+
+    for backend in backends:
+        mismatches = [(k, expected.get(k), c) for k, c in results[backend]['codes'].items() if not c or expected.get(k) != c]
+        for name, exp_code, code in mismatches[:10]:
+            print(f"  {backend}: {name} -> '{code}' (expected '{exp_code}')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Streamlit-free core of the scanner app: row building, Sheets/Excel writes,
+history parsing and the hot-reloaded master data index.
+
+Used by app.py (which adds the UI messages) and by load_test.py, so the load
+test exercises the same code paths as the app.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+SHEET_NAME = "Data Scan"
+# Column order of the Google Sheet, as written by append_sheet_rows
+SHEET_COLUMNS = ["Timestamp", "NIK Operator", "Nama Operator", "Component Number", "Nama Barang", "Quantity", "Keterangan"]
+
+
+# --- SAVE ---
+def build_batch_rows(items, operator_nik, operator_name, reason="", timestamp=None):
+    """
+    Builds the local-file rows and the Sheets rows for one transaction.
+    All lines share one timestamp.
+    Args:
+        items (list): List of dicts with 'number', 'description', 'qty', 'image_name'.
+    Returns:
+        tuple: (local_rows as list of dicts, sheet_rows as list of lists)
+    """
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    new_rows = []
+    sheet_rows = []
+    for item in items:
+        new_rows.append({
+            "Timestamp": timestamp,
+            "NIK Operator": operator_nik,
+            "Nama Operator": operator_name,
+            "Component Number": item['number'],
+            "Nama Barang": item.get('description', ''),
+            "Quantity": item['qty'],
+            "Image Name": item.get('image_name', 'N/A'),
+            "Keterangan": reason
+        })
+        sheet_rows.append([timestamp, operator_nik, operator_name, item['number'], item.get('description', ''), item['qty'], reason])
+    return new_rows, sheet_rows
+
+
+def append_sheet_rows(client, sheet_rows):
+    """
+    Appends all rows with one API call. Errors (including gspread.SpreadsheetNotFound)
+    are raised to the caller.
+    """
+    sheet = client.open(SHEET_NAME).sheet1
+    sheet.append_rows(sheet_rows)
+    return sheet
+
+
+def write_local_rows(new_rows, session_nik, base_dir="."):
+    """
+    Appends rows to the per-session Excel file (one read + one rewrite),
+    falling back to appending to a CSV file if Excel fails.
+    Returns:
+        tuple: (saved_as: 'Excel' | 'CSV' | None, safe_nik, excel_error or None)
+    """
+    # Filename is based on the Session NIK (usually 'general'), operator_nik is saved inside
+    safe_nik = session_nik if session_nik else "unknown"
+    df_new = pd.DataFrame(new_rows)
+    try:
+        file_path_xlsx = os.path.join(base_dir, f"data_{safe_nik}.xlsx")
+        if os.path.exists(file_path_xlsx):
+            df_existing = pd.read_excel(file_path_xlsx)
+            df_final = pd.concat([df_existing, df_new], ignore_index=True)
+        else:
+            df_final = df_new
+        df_final.to_excel(file_path_xlsx, index=False)
+        return "Excel", safe_nik, None
+    except Exception as e:
+        excel_error = e
+
+    # CSV Fallback
+    try:
+        file_path_csv = os.path.join(base_dir, f"data_{safe_nik}.csv")
+        header = not os.path.exists(file_path_csv)
+        df_new.to_csv(file_path_csv, mode='a' if not header else 'w', header=header, index=False)
+        return "CSV", safe_nik, excel_error
+    except Exception:
+        return None, safe_nik, excel_error
+
+
+# --- HISTORY ---
+def parse_history_values(raw_data):
+    """
+    Turns sheet.get_all_values() output into a DataFrame with SHEET_COLUMNS.
+    """
+    if not raw_data:
+        return pd.DataFrame()
+
+    # Simple heuristic: Check if "Timestamp" is in the first row (case-insensitive)
+    first_row = raw_data[0]
+    is_header = len(first_row) > 0 and "timestamp" in str(first_row[0]).lower()
+    data_rows = raw_data[1:] if is_header else raw_data
+
+    if not data_rows:
+        return pd.DataFrame(columns=SHEET_COLUMNS)
+
+    df = pd.DataFrame(data_rows)
+
+    # Rename columns by index; extra columns are kept, missing ones are added empty
+    current_cols = df.columns.tolist()
+    mapping = {current_cols[i]: SHEET_COLUMNS[i] for i in range(min(len(current_cols), len(SHEET_COLUMNS)))}
+    df = df.rename(columns=mapping)
+    for col in SHEET_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+# --- MASTER DATA (Hot Reload) ---
+# Data_sparepart.csv / operator.csv are re-read when they change on disk, without a restart.
+MASTER_CHECK_INTERVAL = 2.0 # Seconds between stat() checks of a master file
+
+MasterSnapshot = namedtuple("MasterSnapshot", ["loaded", "index", "digest", "version", "diff"])
+
+
+class MasterFile:
+    """
+    In-memory view of a master CSV, shared by all sessions.
+    The file is stat()-ed at most every MASTER_CHECK_INTERVAL seconds; it is only
+    re-parsed if mtime/size changed and the content hash differs, and the new
+    key -> value index is swapped in as a new snapshot.
+    """
+    def __init__(self, path, key_col, value_col):
+        self.path = path
+        self.key_col = key_col
+        self.value_col = value_col
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = 0.0
+        self._snapshot = MasterSnapshot(False, {}, None, 0, None)
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._last_check >= MASTER_CHECK_INTERVAL:
+            # Only one session reloads, the others keep serving the current snapshot
+            # (they wait only on the very first load, when there is nothing to serve yet)
+            if self._lock.acquire(blocking=not self._snapshot.loaded):
+                try:
+                    self._last_check = now
+                    self._refresh()
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return # Keep last good snapshot if the file is missing / being replaced
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if digest == self._snapshot.digest:
+                self._signature = signature # Touched but unchanged
+                return
+            # Read as string to ensure matching works correctly
+            df = pd.read_csv(io.BytesIO(data), dtype=str)
+            new_map = dict(zip(df[self.key_col], df[self.value_col]))
+        except Exception:
+            return # Half-written or invalid file: retry on the next check
+
+        # Diff against the previous index is only reported (toast), the new map replaces it
+        old_index = self._snapshot.index
+        diff = {
+            'added': sum(1 for k in new_map if k not in old_index),
+            'removed': sum(1 for k in old_index if k not in new_map),
+            'changed': sum(1 for k in new_map if k in old_index and old_index[k] != new_map[k]),
+        }
+        # Single reference assignment: readers see either the old or the new snapshot
+        self._snapshot = MasterSnapshot(True, new_map, digest, self._snapshot.version + 1, diff)
+        self._signature = signature